@@ -0,0 +1,62 @@
+"""Builds the game into a single-file zipapp with pre-compiled modules and the levels embedded"""
+# NOTE: The bundle only runs on the Python version it was built with since both .pyc files and marshal data are
+# version specific
+
+# Imports
+import json
+import marshal
+import os
+import py_compile
+import shutil
+import sys
+import zipapp
+from tempfile import TemporaryDirectory
+
+from loader import LEVELS_DIR, STREAM_THRESHOLD
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODULES = ['game', 'interface', 'loader', 'main', 'map', 'player', 'relay', 'streaming']
+
+
+def build(target):
+    """
+    Builds the zipapp
+
+    Parameters:
+        target (str): path of the .pyz file to be created
+    """
+    with TemporaryDirectory() as build_dir:
+        # Modules are only shipped as .pyc files so nothing gets compiled at startup
+        for module in MODULES:
+            py_compile.compile(
+                os.path.join(SOURCE_DIR, f'{module}.py'),
+                cfile=os.path.join(build_dir, f'{module}.pyc'),
+                doraise=True,
+                invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH
+            )
+
+        # Levels are converted from JSON to marshal data, which read_level prefers when it is bundled. Levels large
+        # enough to be streamed are copied as they are, since converting them would mean loading them whole
+        os.mkdir(os.path.join(build_dir, 'levels'))
+        for file_name in os.listdir(LEVELS_DIR):
+            name, extension = os.path.splitext(file_name)
+            if extension != '.json':
+                continue
+
+            if os.path.getsize(os.path.join(LEVELS_DIR, file_name)) > STREAM_THRESHOLD:
+                shutil.copyfile(os.path.join(LEVELS_DIR, file_name), os.path.join(build_dir, 'levels', file_name))
+            else:
+                with open(os.path.join(LEVELS_DIR, file_name)) as rooms_file:
+                    rooms = json.load(rooms_file)
+                with open(os.path.join(build_dir, 'levels', f'{name}.marshal'), 'wb') as level_file:
+                    marshal.dump(rooms, level_file)
+
+        with open(os.path.join(build_dir, '__main__.py'), 'w') as main_file:
+            main_file.write("import runpy\nrunpy.run_module('main', run_name='__main__')\n")
+
+        # Streamed levels are read straight out of the archive, so nothing in it can be compressed
+        zipapp.create_archive(build_dir, target, interpreter='/usr/bin/env python3', compressed=False)
+
+
+if __name__ == '__main__':
+    build(sys.argv[1] if len(sys.argv) > 1 else 'no_escape.pyz')
@@ -0,0 +1,479 @@
+"""Fuzzer that plays random commands on every level and checks the game's invariants after each one"""
+# NOTE: Debug commands (give, tp and durset) are never generated since they break the invariants on purpose
+
+# Imports
+import argparse
+import json
+import marshal
+import os
+import sys
+from multiprocessing import Pool
+from random import Random
+from tempfile import mkstemp
+from time import perf_counter
+
+from game import Game
+from loader import LEVELS_DIR, read_level
+from map import Map
+from player import Player
+from streaming import RoomIndex, StreamingRooms
+
+# Levels and the room the player starts in
+LEVELS = {
+    'level_one': 'Dark Room',
+    'level_two': 'Stairwell',
+    'level_three': 'Cellar'
+}
+# Rooms that finish each level
+TRIGGERS = {
+    'level_one': 'Stairwell',
+    'level_two': 'Elevator Shaft',
+    'level_three': 'Exit'
+}
+# Levels the player carries their inventory into, mapped to the level the inventory comes from
+CARRY_OVER = {'level_two': 'level_one'}
+# Share of sequences whose commands are picked by explore instead of at random
+GUIDED_SHARE = 0.25
+# Number of random sequences each worker plays on a level to find the inventories it can be finished with
+CARRY_OVER_ATTEMPTS = 500
+
+# Characters the random levels used for checking the streaming indexer build names and items from, including the ones
+# it has to treat specially
+AWKWARD_CHARACTERS = 'ab {}[]":,\\\'é\n'
+
+# Level data shared by every sequence a worker runs, see load_levels
+_levels = {}
+# Inventories the player can reach the next level with, for each level in CARRY_OVER, see find_carry_overs
+_carry_overs = {}
+
+
+def load_levels():
+    """Loads each level once, along with the commands that make sense on it"""
+    # Levels are kept as marshal data since restoring a fresh copy from it is much faster than parsing JSON
+    for level in LEVELS:
+        rooms = read_level(level)
+        items = sorted({room['item'] for room in rooms.values() if 'item' in room} - {'monster'})
+
+        commands = [f'go {direction}' for direction in ('n', 's', 'e', 'w', 'x')]
+        commands += [f'get {item}' for item in items + ['monster']]
+        commands += [f'use {item}' for item in items + ['hammer', 'Strange Tome', 'cracked sword']]
+        commands += ['help', 'get', 'use', 'go', 'dance']
+
+        _levels[level] = marshal.dumps(rooms), items, commands
+
+
+def explore(rng, level, length, inventory=(), durability=2):
+    """
+    Plays a level picking only commands that do something in the current room and never walking into a monster without
+    a sword, which finishes levels far more often than picking any command
+
+    Parameters:
+        rng (Random): random number generator to pick commands with
+        level (str): level to play
+        length (int): most commands to play
+        inventory (list) (optional): starting inventory
+        durability (int) (optional): starting sword durability
+
+    Returns:
+        list(str): the commands played
+    """
+    game = Game(Player(list(inventory), durability), Map(marshal.loads(_levels[level][0]), LEVELS[level]))
+    commands = []
+
+    while len(commands) < length and game.map.current_room != TRIGGERS[level]:
+        room = game.map.rooms[game.map.current_room]
+        armed = 'sword' in game.player.inventory or 'cracked sword' in game.player.inventory
+        options = [f'go {direction}' for direction in ('n', 's', 'e', 'w')
+                   if direction in room and (armed or game.map.rooms[room[direction]].get('item') != 'monster')]
+        options += [f'use {item}' for item in game.player.inventory]
+        if 'item' in room and room['item'] != 'monster':
+            options.append(f'get {room["item"]}')
+
+        commands.append(rng.choice(options))
+        game.parse_command(commands[-1])
+        if game.check_death('monster')[1]:
+            break
+
+    return commands
+
+
+def find_carry_overs(rng, length):
+    """
+    Finishes the levels in CARRY_OVER with random sequences to find the inventories the player can really start the
+    next level with, keeping the shortest sequence found for each one
+
+    Parameters:
+        rng (Random): random number generator of the worker
+        length (int): number of commands in each sequence
+    """
+    for level, previous_level in CARRY_OVER.items():
+        states = {}
+        for _ in range(CARRY_OVER_ATTEMPTS):
+            commands = explore(rng, previous_level, length)
+            played, failure, _, game = play(previous_level, [], 2, commands)
+            if failure is not None or game.map.current_room != TRIGGERS[previous_level]:
+                continue
+
+            state = tuple(sorted(game.player.inventory)), game.player.sword_durability
+            if state not in states:
+                states[state] = shrink_finish(previous_level, state, commands[:played])
+
+        _carry_overs[level] = [(list(inventory), durability, commands)
+                               for (inventory, durability), commands in sorted(states.items())]
+
+
+def starting_inventory(rng, level):
+    """
+    Picks the inventory and sword durability the player could have when starting a level
+
+    Parameters:
+        rng (Random): random number generator of the sequence
+        level (str): level being started
+
+    Returns:
+        tuple(list, int, list(str)): the inventory, the sword durability and the commands that finished the previous
+                                     level with them
+    """
+    if not _carry_overs.get(level):
+        return [], 2, []
+
+    inventory, durability, commands = rng.choice(_carry_overs[level])
+    return list(inventory), durability, commands
+
+
+def check(game, keys, result):
+    """
+    Checks the game's invariants after a command
+
+    Parameters:
+        game (Game): game the command was played on
+        keys (int): number of keys the player had before the command
+        result (str): result message of the command
+
+    Returns:
+        str: description of the first broken invariant, None if they all hold
+    """
+    inventory = game.player.inventory
+
+    if game.player.sword_durability < 0:
+        return 'negative sword durability'
+    if inventory.count('sword') + inventory.count('cracked sword') > 1:
+        return 'duplicate swords'
+    if game.map.current_room not in game.map.rooms:
+        return 'current room does not exist'
+
+    # Keys are only ever gained by picking one up and lost by unlocking a door
+    expected_keys = keys + (result == 'You got the key!') - (result == 'You unlocked the door')
+    if inventory.count('key') != expected_keys:
+        return 'key count changed unexpectedly'
+    if game.map.rooms[game.map.current_room].get('status') == 'locked':
+        return 'entered a locked room without using a key'
+
+    return None
+
+
+def play(level, inventory, durability, commands, rooms=None, record=False):
+    """
+    Plays a sequence of commands the same way Interface.main_loop does, checking the invariants after each one
+
+    Parameters:
+        level (str): level to play on
+        inventory (list): starting inventory
+        durability (int): starting sword durability
+        commands (list(str)): commands to play
+        rooms (dict | StreamingRooms) (optional): rooms to play on, a fresh copy of the level by default
+        record (bool) (optional): whether to record the outcome of every command
+
+    Returns:
+        tuple(int, str, list, Game): number of commands played, the first broken invariant (None if there wasn't one),
+                                     the outcome of every command if recorded and the game as it was left
+    """
+    if rooms is None:
+        rooms = marshal.loads(_levels[level][0])
+    game = Game(Player(list(inventory), durability), Map(rooms, LEVELS[level]))
+    results = []
+
+    for step, command in enumerate(commands, 1):
+        keys = game.player.inventory.count('key')
+        result = game.parse_command(command)
+        death = game.check_death('monster')
+        if record:
+            results.append((result, death[0], repr(game)))
+
+        failure = check(game, keys, result)
+        if failure is not None:
+            return step, failure, results, game
+        # The level has to be restarted once the player dies, and it is over once they reach the trigger room
+        if death[1] or game.map.current_room == TRIGGERS[level]:
+            return step, None, results, game
+
+    return len(commands), None, results, game
+
+
+def minimize(commands, reproduces):
+    """
+    Removes as many commands as possible from a sequence while it keeps reproducing something
+
+    Parameters:
+        commands (list(str)): commands to be minimized
+        reproduces (Function): takes a sequence of commands and returns how many of them it takes to reproduce the
+                               behavior, None if they don't
+
+    Returns:
+        list(str): the smallest sequence found
+    """
+    chunk = len(commands) // 2
+    while chunk >= 1:
+        index = 0
+        while index < len(commands):
+            candidate = commands[:index] + commands[index + chunk:]
+            steps = reproduces(candidate)
+            if steps is not None:
+                # Anything after the behavior is reproduced is irrelevant
+                commands = candidate[:steps]
+            else:
+                # Sliding one command at a time also catches pairs like 'go e', 'go w' that straddle two chunks
+                index += 1
+        chunk //= 2
+
+    return commands
+
+
+def shrink(level, inventory, durability, commands, failure):
+    """
+    Removes as many commands as possible from a failing sequence while keeping the same invariant broken
+
+    Parameters:
+        level (str): level the sequence fails on
+        inventory (list): starting inventory
+        durability (int): starting sword durability
+        commands (list(str)): failing commands
+        failure (str): invariant the commands break
+
+    Returns:
+        list(str): the smallest failing sequence found
+    """
+    def reproduces(candidate):
+        steps, candidate_failure, _, _ = play(level, inventory, durability, candidate)
+        return steps if candidate_failure == failure else None
+
+    return minimize(commands, reproduces)
+
+
+def shrink_finish(level, state, commands):
+    """
+    Removes as many commands as possible from a sequence that finishes a level while keeping the inventory and sword
+    durability it finishes with
+
+    Parameters:
+        level (str): level the sequence finishes
+        state (tuple(tuple, int)): sorted inventory and sword durability the level is finished with
+        commands (list(str)): commands that finish the level
+
+    Returns:
+        list(str): the smallest sequence found
+    """
+    def reproduces(candidate):
+        steps, failure, _, game = play(level, [], 2, candidate)
+        finished = failure is None and game.map.current_room == TRIGGERS[level]
+        if finished and (tuple(sorted(game.player.inventory)), game.player.sword_durability) == state:
+            return steps
+
+        return None
+
+    return minimize(commands, reproduces)
+
+
+def differential(level, inventory, durability, commands, chunk_size):
+    """
+    Plays a sequence on an in-memory copy of the level and on a streamed copy and compares the outcomes
+
+    Parameters:
+        level (str): level to play on
+        inventory (list): starting inventory
+        durability (int): starting sword durability
+        commands (list(str)): commands to play
+        chunk_size (int): chunk size the level is streamed with, small ones make rooms straddle chunk boundaries
+
+    Returns:
+        str: description of the difference, None if both played out the same way
+    """
+    eager = play(level, inventory, durability, commands, record=True)
+    try:
+        with RoomIndex(os.path.join(LEVELS_DIR, f'{level}.json'), chunk_size=chunk_size) as index:
+            streamed = play(level, inventory, durability, commands, StreamingRooms(index, LEVELS[level]), record=True)
+    # A broken indexer can lose rooms or misread the file altogether
+    except (KeyError, ValueError) as error:
+        return f'streaming the level raised {type(error).__name__}'
+
+    # The games themselves are different objects, only what happened in them is compared
+    if eager[:3] != streamed[:3]:
+        return 'streamed level plays differently'
+
+    return None
+
+
+def check_streaming(rng, path):
+    """
+    Writes a random level with awkward names and nested values and checks that streaming it gives the same rooms as
+    json.load does, or that it is rejected if one of the rooms isn't an object
+
+    Parameters:
+        rng (Random): random number generator of the sequence
+        path (str): file the level is written to
+
+    Returns:
+        tuple(str, list(str)): description of the difference (None if there wasn't one) and the details needed to
+                               reproduce it
+    """
+    rooms = {}
+    for _ in range(rng.randint(0, 20)):
+        name = ''.join(rng.choices(AWKWARD_CHARACTERS, k=rng.randint(0, 8)))
+        room = {'coords': [rng.randint(0, 9), rng.randint(0, 9)]}
+        if rng.random() < 0.5:
+            room['item'] = ''.join(rng.choices(AWKWARD_CHARACTERS, k=rng.randint(0, 8)))
+        # Nested objects make the indexer fall back from matching whole rooms to scanning token by token
+        if rng.random() < 0.3:
+            room['nested'] = {name: [name, {}, {'deeper': room.get('item', '')}]}
+        rooms[name] = room
+
+    # A room that isn't an object has to be rejected wherever it is in the file
+    invalid = rooms and rng.random() < 0.1
+    if invalid:
+        rooms[rng.choice(list(rooms))] = rng.choice([0, 'room', None, [], [{}]])
+
+    with open(path, 'w', encoding='utf-8') as level_file:
+        json.dump(rooms, level_file, indent=rng.choice([None, 1, 4]), ensure_ascii=rng.random() < 0.5)
+    chunk_size = rng.randint(1, 4096)
+
+    details = [f'chunk size: {chunk_size}', f'level: {rooms!r}']
+
+    try:
+        with RoomIndex(path, chunk_size=chunk_size) as index:
+            streamed = dict(StreamingRooms(index))
+    except ValueError:
+        if not invalid:
+            return 'streaming the level raised ValueError', details
+    except KeyError:
+        return 'streaming the level raised KeyError', details
+    else:
+        if invalid:
+            return 'streaming accepted a room that isn\'t an object', details
+        if streamed != rooms:
+            return 'streamed level differs from json.load', details
+
+    return None, []
+
+
+def fuzz_worker(seed, seconds, length, differential_every):
+    """
+    Plays random sequences on every level until the time runs out
+
+    Parameters:
+        seed (int): seed of the worker, each sequence is seeded from it so failures can be reproduced
+        seconds (float): how long to fuzz for
+        length (int): number of commands in each sequence
+        differential_every (int): how often a sequence is also compared against a streamed copy of the level, and the
+                                  streaming indexer is checked against a random level
+
+    Returns:
+        tuple(int, int, dict): sequences played, commands played, and the seed and details of a shrunk failure for each
+                               (level, invariant) pair
+    """
+    # Setting up counts towards the time so that workers finish when expected
+    end = perf_counter() + seconds
+    if not _levels:
+        load_levels()
+        find_carry_overs(Random(seed), length)
+
+    sequences = 0
+    steps = 0
+    failures = {}
+    level_file, level_path = mkstemp(suffix='.json')
+    os.close(level_file)
+
+    try:
+        while perf_counter() < end:
+            # Time is only checked between batches, it is comparatively slow
+            for _ in range(100):
+                sequence_seed = seed * 1_000_000_007 + sequences
+                rng = Random(sequence_seed)
+                level = rng.choice(list(LEVELS))
+                inventory, durability, previous_commands = starting_inventory(rng, level)
+                # Some of the sequences are guided, which gets much deeper into the levels than random commands do
+                if rng.random() < GUIDED_SHARE:
+                    commands = explore(rng, level, length, inventory, durability)
+                else:
+                    commands = rng.choices(_levels[level][2], k=length)
+                details = [f'starting inventory: {inventory}, sword durability: {durability}']
+                if previous_commands:
+                    details.append(f'reached by finishing {CARRY_OVER[level]} with: {", ".join(previous_commands)}')
+
+                played, failure, _, _ = play(level, inventory, durability, commands)
+                if failure is None and differential_every and sequences % differential_every == 0:
+                    chunk_size = rng.randint(1, 4096)
+                    failure = differential(level, inventory, durability, commands[:played], chunk_size)
+                    details.append(f'streamed with a chunk size of {chunk_size}')
+
+                    streaming_failure, streaming_details = check_streaming(rng, level_path)
+                    if streaming_failure is not None and ('streaming', streaming_failure) not in failures:
+                        failures['streaming', streaming_failure] = sequence_seed, streaming_details
+
+                if failure is not None and (level, failure) not in failures:
+                    if failure != 'streamed level plays differently':
+                        commands = shrink(level, inventory, durability, commands[:played], failure)
+                    failures[level, failure] = sequence_seed, details + [f'> {command}' for command in commands]
+
+                sequences += 1
+                steps += played
+    finally:
+        os.remove(level_path)
+
+    return sequences, steps, failures
+
+
+def main():
+    """
+    Runs the fuzzer with the options given on the command line and prints the throughput and every failure found
+
+    Returns:
+        int: exit status, 1 if any invariant was broken (or a streamed level differed) and 0 otherwise
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--seconds', type=float, default=10, help='how long each worker fuzzes for')
+    parser.add_argument('--length', type=int, default=200, help='number of commands in each sequence')
+    parser.add_argument('--seed', type=int, default=0, help='base seed, each worker uses the next one')
+    parser.add_argument('--differential-every', type=int, default=1000,
+                        help='compare every nth sequence against a streamed copy of the level (0 disables it)')
+    args = parser.parse_args()
+
+    start = perf_counter()
+    with Pool(args.workers) as pool:
+        results = pool.starmap(
+            fuzz_worker,
+            [(args.seed + worker, args.seconds, args.length, args.differential_every) for worker in range(args.workers)]
+        )
+    elapsed = perf_counter() - start
+
+    sequences = sum(result[0] for result in results)
+    steps = sum(result[1] for result in results)
+    print(f'{sequences} sequences, {steps} commands in {elapsed:.1f}s ({steps / elapsed:,.0f} commands/s)')
+
+    # Keep the shortest failing sequence found for each broken invariant
+    failures = {}
+    for result in results:
+        for key, failure in result[2].items():
+            if key not in failures or len(failure[1]) < len(failures[key][1]):
+                failures[key] = failure
+
+    for (level, invariant), (sequence_seed, details) in sorted(failures.items()):
+        print(f'\n{level}: {invariant} (seed {sequence_seed})')
+        for line in details:
+            print(f'  {line}')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,30 +4,43 @@
 # Imports
 import curses
 from curses.textpad import rectangle
-from time import sleep
+from time import sleep, time
 
-curses.initscr()
+# Colors are set by init_curses once the terminal has been set up
+RED = YELLOW = CYAN = PURPLE = GREEN = BLUE = GREY = 0
+# Standard screen returned by initscr, None until the terminal is set up
+_screen = None
 
-# Colors
-curses.start_color()
 
-# Colors have to be initialized as text, background pairs
-# Adding 8 makes the colors bright
-curses.init_pair(1, curses.COLOR_RED + 8, curses.COLOR_BLACK)
-curses.init_pair(2, curses.COLOR_YELLOW + 8, curses.COLOR_BLACK)
-curses.init_pair(3, curses.COLOR_CYAN + 8, curses.COLOR_BLACK)
-curses.init_pair(4, curses.COLOR_MAGENTA + 8, curses.COLOR_BLACK)
-curses.init_pair(5, curses.COLOR_GREEN + 8, curses.COLOR_BLACK)
-curses.init_pair(6, curses.COLOR_BLUE + 8, curses.COLOR_BLACK)
-curses.init_pair(7, curses.COLOR_BLACK + 8, curses.COLOR_BLACK)
+def init_curses():
+    """Sets up the terminal and the color pairs, only the first call does anything"""
+    global _screen, RED, YELLOW, CYAN, PURPLE, GREEN, BLUE, GREY
 
-RED = curses.color_pair(1)
-YELLOW = curses.color_pair(2)
-CYAN = curses.color_pair(3)
-PURPLE = curses.color_pair(4)
-GREEN = curses.color_pair(5)
-BLUE = curses.color_pair(6)
-GREY = curses.color_pair(7)
+    if _screen is not None:
+        return
+
+    _screen = curses.initscr()
+
+    # Colors
+    curses.start_color()
+
+    # Colors have to be initialized as text, background pairs
+    # Adding 8 makes the colors bright
+    curses.init_pair(1, curses.COLOR_RED + 8, curses.COLOR_BLACK)
+    curses.init_pair(2, curses.COLOR_YELLOW + 8, curses.COLOR_BLACK)
+    curses.init_pair(3, curses.COLOR_CYAN + 8, curses.COLOR_BLACK)
+    curses.init_pair(4, curses.COLOR_MAGENTA + 8, curses.COLOR_BLACK)
+    curses.init_pair(5, curses.COLOR_GREEN + 8, curses.COLOR_BLACK)
+    curses.init_pair(6, curses.COLOR_BLUE + 8, curses.COLOR_BLACK)
+    curses.init_pair(7, curses.COLOR_BLACK + 8, curses.COLOR_BLACK)
+
+    RED = curses.color_pair(1)
+    YELLOW = curses.color_pair(2)
+    CYAN = curses.color_pair(3)
+    PURPLE = curses.color_pair(4)
+    GREEN = curses.color_pair(5)
+    BLUE = curses.color_pair(6)
+    GREY = curses.color_pair(7)
 
 
 class Interface:
@@ -38,6 +51,9 @@ class Interface:
         repr_height (int): height of the game repr in rows
         result_height (int): height of the result window in rows
         map_width (int): width of the map window (right side of screen) in columns
+        byte_budget (int) (optional): number of bytes a single turn may write to the terminal
+        output_counter (OutputCounter) (optional): relay counting the bytes written to the terminal, turns are only
+                                                   measured when one is given
 
     Methods:
         base_display(self): draws outline of the CLI
@@ -45,15 +61,46 @@ class Interface:
         result_display(self, result): handles drawing of the command result in the result_window
         update_map(self, _map, rooms_discovered): updates the map display, redrawing each room and various ornaments
         start_level(self, level_name, *args, level_function=None, end=False): starts a level and displays a title
+        present(self): pushes every pending window update to the terminal in a single write
+        start_turn(self): marks the start of a turn for output accounting
+        end_turn(self): records how many bytes the turn that just finished wrote to the terminal
         main_loop(self, game, checkpoint, trigger_room): main display loop, clears and updates all windows as necessary
     """
-    def __init__(self, height, display_width, repr_height, result_height, map_width):
+    def __init__(self, height, display_width, repr_height, result_height, map_width, byte_budget=None, output_counter=None):
         self.height = height
         self.display_width = display_width
         self.repr_height = repr_height
         self.result_height = result_height
         self.map_width = map_width
 
+        # Windows are created along with the first frame, see _setup
+        self.display_window = None
+        self.repr_window = None
+        self.result_window = None
+        self.map_window = None
+
+        # Output accounting: bytes written by the last turn, by all turns and by the largest one, and how many turns
+        # were measured and went over the budget
+        self.byte_budget = byte_budget
+        self.output_counter = output_counter
+        self.turn_bytes = 0
+        self.total_turn_bytes = 0
+        self.max_turn_bytes = 0
+        self.turns = 0
+        self.turns_over_budget = 0
+        # Bytes written before the current turn started, None between turns
+        self._turn_start = None
+        # Time (seconds since the epoch) the first frame was written to the terminal
+        self.first_frame_time = None
+
+    def _setup(self):
+        """Takes over the terminal and creates the windows, only the first call does anything"""
+        if self.display_window is not None:
+            return
+
+        # Nothing touches the terminal until the first frame is about to be drawn
+        init_curses()
+
         self.y_buffer = (curses.LINES - self.height) // 2
         self.x_buffer = (curses.COLS - (self.display_width + self.map_width)) // 2
 
@@ -75,11 +122,11 @@ class Interface:
         self.display_window.addstr(self.repr_height + 1, self.display_width - 1, '┤')
         # Input box
         rectangle(self.display_window, self.height - 4, 1, self.height - 2, self.display_width - 2)
-        self.display_window.refresh()
+        self.display_window.noutrefresh()
 
         # Draws a border around the map window (right side)
         self.map_window.border()
-        self.map_window.refresh()
+        self.map_window.noutrefresh()
 
     def game_display(self, game):
         """
@@ -118,7 +165,7 @@ class Interface:
 
             else:
                 self.repr_window.addstr(index, 0, line)
-        self.repr_window.refresh()
+        self.repr_window.noutrefresh()
 
     def result_display(self, result):
         """
@@ -150,7 +197,8 @@ class Interface:
             else:
                 self.result_window.addstr(result)
 
-            self.result_window.refresh()
+        # Refreshed even without a message so that the previous one is cleared from the screen
+        self.result_window.noutrefresh()
 
     def update_map(self, _map, rooms_discovered):
         """
@@ -187,7 +235,8 @@ class Interface:
 
                 self.map_window.addstr(room_y * 3 + 2, room_x * 6 + 4, '●', color)
 
-        self.map_window.clear()
+        # erase (unlike clear) lets curses skip every cell that is redrawn unchanged
+        self.map_window.erase()
 
         x, y = map.rooms[map.current_room]['coords']
         if 'width' in map.rooms[map.current_room]:
@@ -241,7 +290,35 @@ class Interface:
                 eval(room[4])
                 draw_room_ornaments()
 
-        self.map_window.refresh()
+        self.map_window.noutrefresh()
+
+    def present(self):
+        """Writes all pending window updates to the terminal at once"""
+        curses.doupdate()
+
+        if self.first_frame_time is None:
+            self.first_frame_time = time()
+
+    def start_turn(self):
+        """Marks the start of a turn for output accounting, called once the player's command has been entered"""
+        if self.output_counter is not None:
+            self.output_counter.settle()
+            self._turn_start = self.output_counter.bytes_written
+
+    def end_turn(self):
+        """Records how many bytes the turn that just finished wrote to the terminal"""
+        if self._turn_start is None:
+            return
+
+        self.output_counter.settle()
+        self.turn_bytes = self.output_counter.bytes_written - self._turn_start
+        self._turn_start = None
+
+        self.turns += 1
+        self.total_turn_bytes += self.turn_bytes
+        self.max_turn_bytes = max(self.max_turn_bytes, self.turn_bytes)
+        if self.byte_budget is not None and self.turn_bytes > self.byte_budget:
+            self.turns_over_budget += 1
 
     def start_level(self, level_name, *args, level_function=None, end=False):
         """
@@ -252,6 +329,7 @@ class Interface:
             level_function (Function): function to be called to start the level
             end (bool) (optional): whether or not the message needs to be escaped with the letter 'q'
         """
+        self._setup()
 
         curses.noecho()
 
@@ -263,7 +341,8 @@ class Interface:
         self.base_display()
         # Display the level name
         self.display_window.addstr(2, (self.display_width - len(level_name)) // 2, level_name, curses.A_BOLD)
-        self.display_window.refresh()
+        self.display_window.noutrefresh()
+        self.present()
 
         if not end:
             sleep(2)
@@ -276,14 +355,16 @@ class Interface:
 
     def main_loop(self, game, checkpoint, trigger_room):
         """Main game loop function"""
+        self._setup()
         rooms_discovered = []
         # Displays pressed keys
         curses.echo()
 
-        # Update all windows
+        # The borders, separator and input box are only drawn once per level, they are never cleared during play
         self.base_display()
         self.game_display(game)
         self.update_map(game.map, rooms_discovered)
+        self.present()
 
         while True:
             # Resize the terminal every iteration (prevents crashes from the window being resized)
@@ -293,18 +374,24 @@ class Interface:
 
             # If the player enters the trigger room, exit the game loop
             if game.map.current_room == trigger_room:
+                self.end_turn()
                 break
 
             # Make the cursor visible before getting input
             curses.curs_set(True)
+            self.end_turn()
             # getstr returns a byte value, this code formats that into a plain string by removing the "b''" literal
             command = str(self.display_window.getstr(self.height - 3, 2, 36)).replace("'", '')[1:]
+            # Only turns where the player entered a command are measured
+            if command:
+                self.start_turn()
             curses.curs_set(False)
 
-            # Clear all displays
-            self.display_window.clear()
-            self.repr_window.clear()
-            self.result_window.clear()
+            # Erase the text windows and the typed command, leaving the static outline untouched
+            self.display_window.addstr(self.height - 3, 2, ' ' * (self.display_width - 4))
+            self.display_window.noutrefresh()
+            self.repr_window.erase()
+            self.result_window.erase()
 
             # If the player passes a command, the result message will be based on how that command gets parsed
             if command:
@@ -315,8 +402,7 @@ class Interface:
             # If the player dies, update the display and ask them to restart
             death = game.check_death('monster')
 
-            # Update all windows
-            self.base_display()
+            # Update all windows, then send everything to the terminal in one go
             self.game_display(game)
             self.result_display(result)
             self.update_map(game.map, rooms_discovered)
@@ -325,27 +411,31 @@ class Interface:
                 self.result_window.addstr(0, 0, death[0][:death[0].index('monster')])
                 self.result_window.addstr('monster', RED)
                 self.result_window.addstr(death[0][death[0].index('monster') + len('monster'):])
-                self.result_window.refresh()
-
                 if death[1]:
                     self.result_window.addstr(1, 0, 'Restart? (y/n)')
-                    self.result_window.refresh()
-
-                    while True:
-                        curses.curs_set(True)
-                        restart = str(self.display_window.getstr(self.height - 3, 2, self.display_width - 4))
-                        restart = restart.replace("'", '')[1:].lower()
-
-                        match restart:
-                            case 'y' | 'yes':
-                                curses.wrapper(checkpoint)
-                                return
-                            case 'n' | 'no':
-                                exit()
-                            case _:
-                                self.result_window.addstr(2, 0, 'Invalid input')
-                                self.result_window.refresh()
-                # Display death message
-                else:
-                    sleep(2)
-                    self.update_map(game.map, rooms_discovered)
+                self.result_window.noutrefresh()
+
+            self.present()
+
+            if death[1]:
+                while True:
+                    curses.curs_set(True)
+                    self.end_turn()
+                    restart = str(self.display_window.getstr(self.height - 3, 2, self.display_width - 4))
+                    restart = restart.replace("'", '')[1:].lower()
+
+                    match restart:
+                        case 'y' | 'yes':
+                            curses.wrapper(checkpoint)
+                            return
+                        case 'n' | 'no':
+                            exit()
+                        case _:
+                            self.result_window.addstr(2, 0, 'Invalid input')
+                            self.result_window.noutrefresh()
+                            self.present()
+            # Display death message
+            elif death[0] is not None:
+                sleep(2)
+                self.update_map(game.map, rooms_discovered)
+                self.present()
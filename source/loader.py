@@ -0,0 +1,136 @@
+"""Functions for loading level files, either from the levels folder or from the data bundled into the zipapp"""
+
+
+# Imports
+import json
+import marshal
+import os
+import pkgutil
+import struct
+import zipfile
+from threading import Thread
+
+from streaming import RoomIndex, StreamingRooms
+
+# The levels folder sits next to the source folder, so the game can be started from any directory
+LEVELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'levels')
+
+# Level files larger than this many bytes are streamed instead of being loaded all at once
+STREAM_THRESHOLD = 8 * 1024 * 1024
+
+# Levels being loaded in the background, mapped to their loading thread and the dictionary the rooms are stored in
+_prewarmed = {}
+# Index of the streamed level being played, restarts reuse it and only parse the rooms again
+_indexes = {}
+
+
+def bundled_json(name):
+    """
+    Finds a level shipped as raw JSON in the zipapp, these are too large to be converted to marshal data
+
+    Parameters:
+        name (str): name of the level file without its extension
+
+    Returns:
+        tuple(str, int, int): path of the zipapp, offset of the level's JSON in it and its size, None if the level isn't
+                              bundled as JSON
+    """
+    # Modules imported from the zipapp are loaded by a zipimporter, which knows the archive's path
+    archive = getattr(__loader__, 'archive', None)
+    if archive is None:
+        return None
+
+    with zipfile.ZipFile(archive) as bundle:
+        try:
+            info = bundle.getinfo(f'levels/{name}.json')
+        except KeyError:
+            return None
+
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError(f'{archive}: levels/{name}.json is compressed and cannot be streamed')
+
+    # The file's data comes right after its local header, which is 30 bytes plus the file name and an extra field
+    with open(archive, 'rb') as bundle_file:
+        bundle_file.seek(info.header_offset + 26)
+        name_length, extra_length = struct.unpack('<HH', bundle_file.read(4))
+
+    return archive, info.header_offset + 30 + name_length + extra_length, info.file_size
+
+
+def read_level(name, starting_room=None):
+    """
+    Reads a level's room dictionary, preferring the pre-compiled copy bundled into the zipapp
+
+    Parameters:
+        name (str): name of the level file without its extension (e.g. 'level_one')
+        starting_room (str) (optional): room the player starts in, loaded first when the level is streamed
+
+    Returns:
+        dict | StreamingRooms: a fresh room dictionary for the level
+    """
+    if name in _indexes:
+        return StreamingRooms(_indexes[name], starting_room)
+
+    # Only the level being played can be restarted, so an earlier level's index would just take up memory
+    for previous in list(_indexes):
+        _indexes.pop(previous).close()
+
+    # Bundled levels are stored as marshal data, which loads much faster than JSON
+    try:
+        data = pkgutil.get_data(__name__, f'levels/{name}.marshal')
+    except OSError:
+        data = None
+
+    if data is not None:
+        return marshal.loads(data)
+
+    # Levels too large to be converted are bundled as JSON and streamed straight out of the zipapp
+    member = bundled_json(name)
+    if member is not None:
+        _indexes[name] = RoomIndex(*member)
+        return StreamingRooms(_indexes[name], starting_room)
+
+    path = os.path.join(LEVELS_DIR, f'{name}.json')
+
+    # Very large levels are indexed in the background and each room is only parsed when it is first accessed
+    if os.path.getsize(path) > STREAM_THRESHOLD:
+        _indexes[name] = RoomIndex(path)
+        return StreamingRooms(_indexes[name], starting_room)
+
+    with open(path) as rooms_file:
+        return json.load(rooms_file)
+
+
+def prewarm(name, starting_room=None):
+    """
+    Starts loading a level in the background so that it is ready by the time it is needed
+
+    Parameters:
+        name (str): name of the level file without its extension
+        starting_room (str) (optional): room the player starts in
+    """
+    result = {}
+    thread = Thread(target=lambda: result.update(rooms=read_level(name, starting_room)), daemon=True)
+    thread.start()
+    _prewarmed[name] = thread, result
+
+
+def load_level(name, starting_room=None):
+    """
+    Returns a level's room dictionary, using the pre-warmed copy the first time if there is one
+
+    Parameters:
+        name (str): name of the level file without its extension
+        starting_room (str) (optional): room the player starts in
+
+    Returns:
+        dict | StreamingRooms: a fresh room dictionary for the level
+    """
+    # A pre-warmed copy is only used once since the game modifies the rooms as it is played (restarts need a new copy)
+    if name in _prewarmed:
+        thread, result = _prewarmed.pop(name)
+        thread.join()
+        if 'rooms' in result:
+            return result['rooms']
+
+    return read_level(name, starting_room)
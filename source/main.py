@@ -2,13 +2,18 @@
 # NOTE: Curses coordinates are (y, x) as opposed to the standard (x, y)
 
 # Imports
-import json
-from time import sleep
+import atexit
+import curses
+import os
+import sys
+from time import sleep, time
 
 from game import Game
 from interface import Interface
+from loader import load_level, prewarm
 from map import Map
 from player import Player
+from relay import OutputCounter
 
 # Dimension constants
 HEIGHT = 32
@@ -16,15 +21,19 @@ DISPLAY_WIDTH = 41
 MAP_WIDTH = 75
 REPR_HEIGHT = 5
 RESULT_HEIGHT = 11
+# Bytes a single turn may write to the terminal
+BYTE_BUDGET = 1024
+
+# Fallback start time for the time to the first frame on systems that don't report when the process started
+MAIN_START_TIME = time()
 
 
 # NOTE: stdscr is used by the curses wrapper. It is unused here, but is required for the code to run
 def level_one(stdscr):
     """First level of the game"""
     stdscr.clear()
-    # Creates room dictionary from a JSON file
-    with open('levels/level_one.json') as rooms_file:
-        rooms = json.load(rooms_file)
+    # Creates room dictionary from the level file
+    rooms = load_level('level_one', 'Dark Room')
 
     # Initialize game with empty inventory in the Dark Room
     game = Game(Player([]), Map(rooms, 'Dark Room'))
@@ -48,8 +57,7 @@ def level_two(stdscr, game):
         game (Game) game object inherited from the first level to allow the inventory to carry over
     """
     stdscr.clear()
-    with open('levels/level_two.json') as rooms_file:
-        rooms = json.load(rooms_file)
+    rooms = load_level('level_two', 'Stairwell')
 
     game.map = Map(rooms, 'Stairwell')
 
@@ -74,8 +82,7 @@ def level_two(stdscr, game):
 def level_three(stdscr):
     """Third level of the game"""
     stdscr.clear()
-    with open('levels/level_three.json') as rooms_file:
-        rooms = json.load(rooms_file)
+    rooms = load_level('level_three', 'Cellar')
 
     game = Game(Player([]), Map(rooms, 'Cellar'))
 
@@ -95,9 +102,60 @@ def level_three(stdscr):
     interface.start_level('CONGRATULATIONS! YOU ESCAPED!', end=True)
 
 
+def launch_time():
+    """
+    Finds when the game was launched, for measuring the time to the first frame
+
+    Returns:
+        float: launch time in seconds since the epoch
+    """
+    # A session broker can pass the time it launched the game at
+    if 'NO_ESCAPE_LAUNCH_TIME' in os.environ:
+        return float(os.environ['NO_ESCAPE_LAUNCH_TIME'])
+
+    # Otherwise use the process start time where the system reports it (Linux), which includes interpreter startup
+    try:
+        with open('/proc/self/stat') as stat_file:
+            # The process name can contain spaces, so fields are counted from after it, starttime is field 22 overall
+            start_ticks = int(stat_file.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as uptime_file:
+            uptime = float(uptime_file.read().split()[0])
+    except OSError:
+        return MAIN_START_TIME
+
+    return time() - (uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+
+
+def report():
+    """Prints the time to the first frame and the bytes written per turn once the terminal has been restored"""
+    if not curses.isendwin():
+        curses.endwin()
+
+    if interface.output_counter is not None:
+        interface.output_counter.close()
+
+    if '--timing' in sys.argv[1:] and interface.first_frame_time is not None:
+        print(f'Time to first frame: {(interface.first_frame_time - launch_time()) * 1000:.1f} ms', file=sys.stderr)
+
+    if interface.turns:
+        print(f'Bytes per turn: {interface.total_turn_bytes / interface.turns:.0f} average, '
+              f'{interface.max_turn_bytes} max over {interface.turns} turns, '
+              f'{interface.turns_over_budget} over the budget of {BYTE_BUDGET}', file=sys.stderr)
+
+
 if __name__ == '__main__':
+    # The first level loads in the background while the terminal is set up and the title screen is up
+    prewarm('level_one', 'Dark Room')
+
+    # Passing --bytes relays the game's output through a pseudo-terminal to count the bytes each turn writes
+    output_counter = OutputCounter() if '--bytes' in sys.argv[1:] else None
+
     # Global window initialization
-    interface = Interface(HEIGHT, DISPLAY_WIDTH, REPR_HEIGHT, RESULT_HEIGHT, MAP_WIDTH)
+    interface = Interface(HEIGHT, DISPLAY_WIDTH, REPR_HEIGHT, RESULT_HEIGHT, MAP_WIDTH, BYTE_BUDGET, output_counter)
+
+    # Passing --timing reports the time to the first frame when the game closes, --bytes reports the output per turn
+    if '--timing' in sys.argv[1:] or output_counter is not None:
+        atexit.register(report)
 
     # Title display
     interface.start_level('NO ESCAPE')
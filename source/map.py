@@ -4,7 +4,8 @@
 class Map:
     """
     Parameters:
-        rooms (dict): a dictionary containing all information for each room in the map
+        rooms (dict | StreamingRooms): a dictionary containing all information for each room in the map, streamed rooms
+                                       are read from the level file the first time they are accessed
         starting_room (str): The room that the player starts in
 
     Methods:
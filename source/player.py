@@ -30,13 +30,18 @@ class Player:
         if 'item' in current_room:
             if item.lower() == current_room['item'].lower():
                 item = current_room['item']
-                # Add the item to the player's inventory and remove it from the room
-                self.inventory.append(item)
-                del current_room['item']
 
                 if item == 'sword':
+                    # A new sword replaces the one the player is carrying instead of being carried alongside it
+                    for sword in ('sword', 'cracked sword'):
+                        if sword in self.inventory:
+                            self.inventory.remove(sword)
                     self.sword_durability = 2
 
+                # Add the item to the player's inventory and remove it from the room
+                self.inventory.append(item)
+                del current_room['item']
+
                 return f'You got the {item}!'
             else:
                 return 'That item isn\'t here!'
@@ -0,0 +1,103 @@
+"""Relay between curses and the real terminal that counts every byte written to the screen"""
+# NOTE: This works the same way the `script` command does: the game is attached to a pseudo-terminal and background
+# threads copy keys into it and output out of it, so the output can be counted exactly as the terminal receives it
+
+# Imports
+import fcntl
+import os
+import pty
+import select
+import termios
+from threading import Lock, Thread
+
+# How long the output has to be quiet before settle decides curses is done writing, in seconds
+SETTLE_TIME = 0.01
+
+
+class OutputCounter:
+    """
+    Replaces stdin and stdout with a pseudo-terminal until closed
+
+    Methods:
+        settle(self): waits until the output curses has written so far has reached the terminal
+        close(self): puts stdin, stdout and the terminal back the way they were
+    """
+    def __init__(self):
+        # Total number of bytes written to the terminal
+        self.bytes_written = 0
+
+        self._terminal_in = os.dup(0)
+        self._terminal_out = os.dup(1)
+        self._attributes = termios.tcgetattr(self._terminal_in)
+
+        master, slave = pty.openpty()
+        # The pseudo-terminal starts out with the real terminal's settings and size
+        termios.tcsetattr(slave, termios.TCSANOW, self._attributes)
+        fcntl.ioctl(slave, termios.TIOCSWINSZ, fcntl.ioctl(self._terminal_out, termios.TIOCGWINSZ, bytes(8)))
+
+        # The pseudo-terminal handles echo and line editing, so the real terminal just passes bytes through. Signals are
+        # left on so that ctrl+c still reaches the game
+        attributes = termios.tcgetattr(self._terminal_in)
+        attributes[0] &= ~(termios.ICRNL | termios.INLCR | termios.IGNCR | termios.IXON)
+        attributes[1] &= ~termios.OPOST
+        attributes[3] &= ~(termios.ICANON | termios.ECHO | termios.IEXTEN)
+        attributes[6][termios.VMIN] = 1
+        attributes[6][termios.VTIME] = 0
+        termios.tcsetattr(self._terminal_in, termios.TCSANOW, attributes)
+
+        os.dup2(slave, 0)
+        os.dup2(slave, 1)
+        os.close(slave)
+
+        self._master = master
+        os.set_blocking(self._master, False)
+        self._lock = Lock()
+        self._closed = False
+
+        Thread(target=self._copy_input, daemon=True).start()
+        Thread(target=self._copy_output, daemon=True).start()
+
+    def settle(self):
+        """Waits until the output curses has written so far has reached the terminal"""
+        with self._lock:
+            while select.select([self._master], [], [], SETTLE_TIME)[0]:
+                self._forward()
+
+    def close(self):
+        """Puts stdin, stdout and the terminal back the way they were"""
+        if self._closed:
+            return
+
+        self.settle()
+        self._closed = True
+        os.dup2(self._terminal_in, 0)
+        os.dup2(self._terminal_out, 1)
+        termios.tcsetattr(self._terminal_in, termios.TCSAFLUSH, self._attributes)
+
+    def _copy_input(self):
+        """Copies keys from the real terminal into the pseudo-terminal"""
+        while not self._closed:
+            keys = os.read(self._terminal_in, 1024)
+            if not keys:
+                break
+            os.write(self._master, keys)
+
+    def _copy_output(self):
+        """Copies output from the pseudo-terminal to the real terminal as soon as it is written"""
+        while not self._closed:
+            select.select([self._master], [], [])
+            with self._lock:
+                if not self._closed:
+                    self._forward()
+
+    def _forward(self):
+        """Copies and counts whatever output is waiting in the pseudo-terminal"""
+        try:
+            output = os.read(self._master, 65536)
+        except OSError:
+            # Nothing to read, settle or the other thread got to it first
+            return
+
+        self.bytes_written += len(output)
+        while output:
+            output = output[os.write(self._terminal_out, output):]
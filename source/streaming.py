@@ -0,0 +1,372 @@
+"""Room dictionary that streams a level file instead of loading it all at once, meant for very large levels"""
+# NOTE: Apart from the chunk being read and the rooms that have actually been accessed, the only thing kept in memory is
+# the index. It stores a hash and two offsets per room in arrays of machine integers, so it still grows with the number
+# of rooms, but only by about 24 bytes a room
+
+
+# Imports
+import json
+import os
+import re
+from array import array
+from collections.abc import Mapping
+from threading import Condition, Thread
+
+# Default number of bytes read from the level file at a time while indexing
+CHUNK_SIZE = 1 << 16
+
+# Bytes of level file per bucket of the index, about 100 rooms the size of the ones in the level files
+BUCKET_SIZE = 8192
+
+# A complete JSON string, written so that the regex engine never has to backtrack inside it
+STRING = rb'"[^"\\]*(?:\\.[^"\\]*)*"'
+
+# Tokens the indexer cares about: a complete JSON string, a lone quote (a string cut off at the end of a chunk), a brace
+# or the start of an array
+TOKEN = re.compile(STRING + rb'|["{}\[]', re.DOTALL)
+
+# A whole room with no nested objects, which is what every room in the level files looks like, matched in one go
+ROOM = re.compile(rb'[\s,]*(' + STRING + rb')\s*:\s*\{[^"{}]*(?:' + STRING + rb'[^"{}]*)*\}', re.DOTALL)
+
+
+def _encode_name(name):
+    """
+    Encodes a room name into the bytes the index hashes it by
+
+    Parameters:
+        name (str): the room name
+
+    Returns:
+        bytes: the room name as UTF-8
+    """
+    # JSON allows lone surrogates in strings, so they have to survive the trip through UTF-8
+    return name.encode('utf-8', 'surrogatepass')
+
+
+def _name_key(token):
+    """
+    Turns the bytes of a JSON string into the bytes the index hashes the room name by
+
+    Parameters:
+        token (bytes): JSON string, including its quotes
+
+    Returns:
+        bytes: the room name as UTF-8
+    """
+    # Names without escapes (all of them in practice) are already UTF-8 and can skip the much slower JSON decoder
+    if b'\\' in token:
+        return _encode_name(json.loads(token))
+
+    return token[1:-1]
+
+
+def _positions(values, value):
+    """
+    Finds every position of a value in an array
+
+    Parameters:
+        values (array): array to search
+        value (int): value to search for
+
+    Returns:
+        generator(int): the positions, in order
+    """
+    start = 0
+    try:
+        while True:
+            start = values.index(value, start)
+            yield start
+            start += 1
+    except ValueError:
+        return
+
+
+class RoomIndex:
+    """
+    Parameters:
+        path (str): path of the level's JSON file, or of an archive it is stored in uncompressed
+        start (int) (optional): offset of the level's JSON in the file
+        size (int) (optional): size of the level's JSON in bytes, by default everything after start
+        chunk_size (int) (optional): number of bytes read at a time while indexing
+
+    Methods:
+        read(self, name): parses a fresh copy of a room from the file
+        close(self): stops indexing and closes the level file
+    """
+    def __init__(self, path, start=0, size=None, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.start = start
+        self.size = size
+        self.chunk_size = chunk_size
+
+        # Rooms are spread over buckets by the hash of their name. Each bucket keeps the hashes in one array and the
+        # start and end offsets of the matching '"name": {...}' entries in the file, one after the other, in another
+        buckets = max(1, (os.path.getsize(path) - start if size is None else size) // BUCKET_SIZE)
+        self._hashes = [array('q') for _ in range(buckets)]
+        self._offsets = [array('Q') for _ in range(buckets)]
+        # Number of rooms, only known once the whole file has been indexed
+        self._count = None
+        self._indexed = False
+        self._closed = False
+        self._error = None
+        # Guards both the index and the level file, which the indexing thread reads too when a name appears twice
+        self._condition = Condition()
+
+        self._file = open(path, 'rb')
+
+        Thread(target=self._index, daemon=True).start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        self._wait_for_index()
+        for hashes, offsets in zip(self._hashes, self._offsets):
+            for position in range(len(hashes)):
+                with self._condition:
+                    yield self._entry(offsets[2 * position], offsets[2 * position + 1])[0]
+
+    def __len__(self):
+        self._wait_for_index()
+        return self._count
+
+    def read(self, name):
+        """
+        Parses a fresh copy of a room from the file, waiting for it to be indexed if it hasn't been yet
+
+        Parameters:
+            name (str): name of the room
+
+        Returns:
+            dict: the room, None if the level has no room with that name
+        """
+        if not isinstance(name, str):
+            return None
+
+        target = hash(_encode_name(name))
+        hashes = self._hashes[target % len(self._hashes)]
+        offsets = self._offsets[target % len(self._hashes)]
+
+        with self._condition:
+            while True:
+                # Different names can share a hash, and the same name can appear twice until the file is fully indexed
+                # (the later copy wins, just like with json.load)
+                room = None
+                for position in _positions(hashes, target):
+                    entry_name, entry = self._entry(offsets[2 * position], offsets[2 * position + 1])
+                    if entry_name == name:
+                        room = entry
+                if room is not None:
+                    return room
+
+                if self._indexed:
+                    if self._error is not None:
+                        raise self._error
+                    return None
+
+                self._condition.wait()
+
+    def close(self):
+        """Stops indexing and closes the level file, rooms that were already read can still be used"""
+        with self._condition:
+            self._closed = True
+            self._file.close()
+
+    def _entry(self, start, end):
+        """
+        Parses an entry of the top level object, the caller has to hold the condition
+
+        Parameters:
+            start (int): offset of the entry's name in the file
+            end (int): offset just past the end of the entry's room
+
+        Returns:
+            tuple(str, dict): name and room
+        """
+        self._file.seek(start)
+        (name, room), = json.loads(b'{' + self._file.read(end - start) + b'}').items()
+        return name, room
+
+    def _add(self, entries):
+        """
+        Adds the entries found in a chunk to the index
+
+        Parameters:
+            entries (list(tuple(bytes, int, int))): encoded name of each room, with the start and end offsets of its entry
+        """
+        with self._condition:
+            for key, start, end in entries:
+                target = hash(key)
+                bucket = target % len(self._hashes)
+                self._hashes[bucket].append(target)
+                self._offsets[bucket].append(start)
+                self._offsets[bucket].append(end)
+
+            self._condition.notify_all()
+
+    def _remove_duplicates(self):
+        """Drops the earlier copies of rooms that appear more than once, keeping the last one like json.load does"""
+        with self._condition:
+            for hashes, offsets in zip(self._hashes, self._offsets):
+                # Checking for a repeated hash first keeps this quick, since level files don't repeat names in practice
+                if len(set(hashes)) == len(hashes):
+                    continue
+
+                names = set()
+                for position in reversed(range(len(hashes))):
+                    name = self._entry(offsets[2 * position], offsets[2 * position + 1])[0]
+                    if name in names:
+                        del hashes[position]
+                        del offsets[2 * position:2 * position + 2]
+                    names.add(name)
+
+            self._count = sum(map(len, self._hashes))
+
+    def _wait_for_index(self):
+        """Waits until the whole file has been indexed"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._indexed)
+            if self._error is not None:
+                raise self._error
+
+    def _not_an_object(self, key):
+        """
+        Builds the error raised for a room whose value isn't an object
+
+        Parameters:
+            key (bytes): encoded name of the room
+
+        Returns:
+            ValueError: the error
+        """
+        return ValueError(f'{self.path}: room {key.decode("utf-8", "surrogatepass")!r} is not an object')
+
+    def _index(self):
+        """Reads the file a chunk at a time, recording where each room's entry starts and ends"""
+        try:
+            depth = 0
+            # Encoded name of the room being scanned and the offset its entry starts at
+            key = None
+            start = None
+            # Unprocessed bytes, and the offset of their first byte in the file
+            buffer = b''
+            offset = self.start
+            remaining = self.size
+
+            with open(self.path, 'rb') as level_file:
+                level_file.seek(self.start)
+                while True:
+                    # Closing the index stops it between chunks
+                    if self._closed:
+                        raise ValueError(f'{self.path}: the index was closed before it was finished')
+
+                    if remaining is None:
+                        chunk = level_file.read(self.chunk_size)
+                    else:
+                        chunk = level_file.read(min(self.chunk_size, remaining))
+                        remaining -= len(chunk)
+                    buffer += chunk
+                    entries = []
+
+                    position = 0
+                    while True:
+                        # Fast path for a complete room directly inside the top level object
+                        if depth == 1 and key is None:
+                            match = ROOM.match(buffer, position)
+                            if match is not None:
+                                entries.append((_name_key(match.group(1)), offset + match.start(1), offset + match.end()))
+                                position = match.end()
+                                continue
+
+                        match = TOKEN.search(buffer, position)
+                        if match is None:
+                            consumed = len(buffer)
+                            break
+
+                        token = match.group()
+                        # The string continues in the next chunk, keep it in the buffer
+                        if token == b'"':
+                            consumed = match.start()
+                            break
+
+                        position = match.end()
+                        if token == b'{':
+                            depth += 1
+                        elif token == b'}':
+                            depth -= 1
+                            if depth == 1:
+                                entries.append((key, start, offset + match.end()))
+                                key = None
+                            # The top level object closed on a name whose value was something other than an object
+                            elif depth == 0 and key is not None:
+                                raise self._not_an_object(key)
+                        # Strings directly inside the top level object are room names, anything else there after a
+                        # name is a value that isn't an object
+                        elif depth == 1:
+                            if key is not None:
+                                raise self._not_an_object(key)
+                            if token != b'[':
+                                key = _name_key(token)
+                                start = offset + match.start()
+
+                    self._add(entries)
+
+                    if not chunk:
+                        if depth != 0 or consumed != len(buffer):
+                            raise ValueError(f'{self.path}: unexpected end of file')
+                        self._remove_duplicates()
+                        break
+
+                    offset += consumed
+                    buffer = buffer[consumed:]
+
+        except (OSError, ValueError) as error:
+            self._error = error
+
+        finally:
+            with self._condition:
+                self._indexed = True
+                self._condition.notify_all()
+
+
+class StreamingRooms(Mapping):
+    """
+    Parameters:
+        index (RoomIndex): index of the level file, shared by every copy of the level so restarts don't index it again
+        starting_room (str) (optional): room that is loaded along with its neighbours before the constructor returns
+
+    Methods:
+        __getitem__(self, name): returns a room, parsing it from the file the first time it is accessed
+    """
+    def __init__(self, index, starting_room=None):
+        self.index = index
+
+        # Parsed rooms, these are the dictionaries the game modifies so they are kept once loaded
+        self._rooms = {}
+
+        # Make the starting room and every room next to it playable straight away
+        if starting_room is not None:
+            for direction in ('n', 's', 'e', 'w'):
+                if direction in self[starting_room]:
+                    self[self[starting_room][direction]]
+
+    def __getitem__(self, name):
+        room = self._rooms.get(name)
+
+        if room is None:
+            room = self.index.read(name)
+            if room is None:
+                raise KeyError(name)
+            # Another thread may have loaded the room in the meantime, the first copy is the one that is kept
+            room = self._rooms.setdefault(name, room)
+
+        return room
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)